@@ -1,5 +1,6 @@
 """Init."""
 
+import asyncio
 import logging
 from datetime import timedelta
 
@@ -25,7 +26,6 @@ async def async_setup_entry(
 ) -> bool:
     """Set up the Bticino_X8000 component."""
     data = dict(config_entry.data)
-    bticino_api = BticinoX8000Api(data)
     hass.data.setdefault(DOMAIN, {})
 
     async def add_c2c_subscription(plant_id: str, webhook_id: str) -> str | None:
@@ -58,11 +58,22 @@ async def async_setup_entry(
     async_track_time_interval(hass, update_token, update_interval)
     hass.async_add_job(update_token(None))
     await update_token(None)
-    for plant_data in data["selected_thermostats"]:
-        plant_id = list(plant_data.keys())[0]
-        plant_data = list(plant_data.values())[0]
+    # Build the client from the refreshed token so the concurrent
+    # subscriptions below don't each hit a 401 and refresh it again
+    bticino_api = BticinoX8000Api(data)
+    items = [
+        (plant_id, plant_data)
+        for thermostat in data["selected_thermostats"]
+        for plant_id, plant_data in thermostat.items()
+    ]
+    subscription_ids = await asyncio.gather(
+        *(
+            add_c2c_subscription(plant_id, plant_data.get("webhook_id"))
+            for plant_id, plant_data in items
+        )
+    )
+    for (_, plant_data), subscription_id in zip(items, subscription_ids):
         webhook_id = plant_data.get("webhook_id")
-        subscription_id = await add_c2c_subscription(plant_id, webhook_id)
         if subscription_id is not None:
             plant_data["subscription_id"] = subscription_id
         webhook_handler = BticinoX8000WebhookHandler(hass, webhook_id)
@@ -1,7 +1,10 @@
 """Api."""
 
+import asyncio
 import json
 import logging
+from collections.abc import AsyncIterator, Iterable
+from contextlib import asynccontextmanager
 from typing import Any
 
 import aiohttp
@@ -21,15 +24,27 @@ _LOGGER = logging.getLogger(__name__)
 class BticinoX8000Api:
     """Legrand API class."""
 
-    def __init__(self, data: dict[str, Any]) -> None:
+    def __init__(
+        self, data: dict[str, Any], session: aiohttp.ClientSession | None = None
+    ) -> None:
         """Init function."""
         self.data = data
+        self._session = session
         self.header = {
             "Authorization": self.data["access_token"],
             "Ocp-Apim-Subscription-Key": self.data["subscription_key"],
             "Content-Type": "application/json",
         }
 
+    @asynccontextmanager
+    async def _client_session(self) -> AsyncIterator[aiohttp.ClientSession]:
+        """Yield the shared session, or a short-lived one if none was given."""
+        if self._session is not None:
+            yield self._session
+        else:
+            async with aiohttp.ClientSession() as session:
+                yield session
+
     async def check_api_endpoint_health(self) -> bool:
         """Check API endpoint helth."""
         url = f"{DEFAULT_API_BASE_URL}{AUTH_CHECK_ENDPOINT}"
@@ -39,7 +54,7 @@ class BticinoX8000Api:
             "key2": "value2",
         }
 
-        async with aiohttp.ClientSession() as session:
+        async with self._client_session() as session:
             try:
                 async with session.post(
                     url, headers=self.header, json=payload
@@ -97,7 +112,7 @@ class BticinoX8000Api:
     async def get_plants(self) -> dict[str, Any]:
         """Retrieve thermostat plants."""
         url = f"{DEFAULT_API_BASE_URL}{THERMOSTAT_API_ENDPOINT}{PLANTS}"
-        async with aiohttp.ClientSession() as session:
+        async with self._client_session() as session:
             try:
                 async with session.get(url, headers=self.header) as response:
                     status_code = response.status
@@ -130,32 +145,49 @@ class BticinoX8000Api:
 
     async def get_topology(self, plant_id: str) -> dict[str, Any]:
         """Retrieve thermostat topology."""
+        async with self._client_session() as session:
+            return await self._get_topology(session, plant_id)
+
+    async def get_topologies(
+        self, plant_ids: Iterable[str]
+    ) -> dict[str, dict[str, Any]]:
+        """Retrieve the thermostat topology of several plants."""
+        plant_ids = list(plant_ids)
+        async with self._client_session() as session:
+            topologies = await asyncio.gather(
+                *(self._get_topology(session, plant_id) for plant_id in plant_ids)
+            )
+        return dict(zip(plant_ids, topologies))
+
+    async def _get_topology(
+        self, session: aiohttp.ClientSession, plant_id: str
+    ) -> dict[str, Any]:
+        """Retrieve thermostat topology using the given session."""
         url = f"{DEFAULT_API_BASE_URL}{THERMOSTAT_API_ENDPOINT}{PLANTS}/{plant_id}{TOPOLOGY}"
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.get(url, headers=self.header) as response:
-                    status_code = response.status
-                    content = await response.text()
+        try:
+            async with session.get(url, headers=self.header) as response:
+                status_code = response.status
+                content = await response.text()
 
-                    if status_code == 200:
-                        return {
-                            "status_code": status_code,
-                            "data": json.loads(content)["plant"]["modules"],
-                        }
-                    if status_code == 401:
-                        # Retry the request on 401 Unauthorized
-                        if await self.handle_unauthorized_error(response):
-                            # Retry the original request
-                            return await self.get_topology(plant_id)
+                if status_code == 200:
                     return {
                         "status_code": status_code,
-                        "error": "Failed to get topology.",
+                        "data": json.loads(content)["plant"]["modules"],
                     }
-            except aiohttp.ClientError as e:
+                if status_code == 401:
+                    # Retry the request on 401 Unauthorized
+                    if await self.handle_unauthorized_error(response):
+                        # Retry the original request
+                        return await self._get_topology(session, plant_id)
                 return {
-                    "status_code": 500,
-                    "error": f"Failed to get topology: {e}",
+                    "status_code": status_code,
+                    "error": "Failed to get topology.",
                 }
+        except aiohttp.ClientError as e:
+            return {
+                "status_code": 500,
+                "error": f"Failed to get topology: {e}",
+            }
 
     async def set_chronothermostat_status(
         self, plant_id: str, module_id: str, data: dict[str, Any]
@@ -166,7 +198,7 @@ class BticinoX8000Api:
             f"{THERMOSTAT_API_ENDPOINT}/chronothermostat/thermoregulation/"
             f"addressLocation{PLANTS}/{plant_id}/modules/parameter/id/value/{module_id}"
         )
-        async with aiohttp.ClientSession() as session:
+        async with self._client_session() as session:
             try:
                 async with session.post(
                     url, headers=self.header, data=json.dumps(data)
@@ -201,7 +233,7 @@ class BticinoX8000Api:
             f"{THERMOSTAT_API_ENDPOINT}/chronothermostat/thermoregulation/"
             f"addressLocation{PLANTS}/{plant_id}/modules/parameter/id/value/{module_id}"
         )
-        async with aiohttp.ClientSession() as session:
+        async with self._client_session() as session:
             try:
                 async with session.get(url, headers=self.header) as response:
                     status_code = response.status
@@ -229,7 +261,7 @@ class BticinoX8000Api:
             f"{THERMOSTAT_API_ENDPOINT}/chronothermostat/thermoregulation/"
             f"addressLocation{PLANTS}/{plant_id}/modules/parameter/id/value/{module_id}/measures"
         )
-        async with aiohttp.ClientSession() as session:
+        async with self._client_session() as session:
             try:
                 async with session.get(url, headers=self.header) as response:
                     status_code = response.status
@@ -258,7 +290,7 @@ class BticinoX8000Api:
             f"addressLocation{PLANTS}/{plant_id}/modules/parameter/id/value/{module_id}/"
             f"programlist"
         )
-        async with aiohttp.ClientSession() as session:
+        async with self._client_session() as session:
             try:
                 async with session.get(url, headers=self.header) as response:
                     status_code = response.status
@@ -284,7 +316,7 @@ class BticinoX8000Api:
     async def get_subscriptions_c2c_notifications(self) -> dict[str, Any]:
         """Get C2C subscriptions."""
         url = f"{DEFAULT_API_BASE_URL}{THERMOSTAT_API_ENDPOINT}/subscription"
-        async with aiohttp.ClientSession() as session:
+        async with self._client_session() as session:
             try:
                 async with session.get(url, headers=self.header) as response:
                     status_code = response.status
@@ -310,7 +342,7 @@ class BticinoX8000Api:
     ) -> dict[str, Any]:
         """Add C2C subscriptions."""
         url = f"{DEFAULT_API_BASE_URL}{THERMOSTAT_API_ENDPOINT}{PLANTS}/{plant_id}/subscription"
-        async with aiohttp.ClientSession() as session:
+        async with self._client_session() as session:
             try:
                 async with session.post(
                     url, headers=self.header, data=json.dumps(data)
@@ -342,7 +374,7 @@ class BticinoX8000Api:
             f"{PLANTS}/{plant_id}/subscription/{subscription_id}"
         )
 
-        async with aiohttp.ClientSession() as session:
+        async with self._client_session() as session:
             try:
                 async with session.delete(url, headers=self.header) as response:
                     status_code = response.status
@@ -1,14 +1,18 @@
 """Config Flow."""
 
+import asyncio
+import functools
 import logging
 import secrets
+from dataclasses import asdict, dataclass
 from typing import Any
-from urllib.parse import parse_qs, urlparse
+from urllib.parse import quote, unquote_plus
 
 import voluptuous as vol
 from homeassistant import config_entries
 from homeassistant.components.webhook import async_generate_id as generate_id
 from homeassistant.data_entry_flow import FlowResult
+from homeassistant.helpers import aiohttp_client
 from homeassistant.helpers import config_validation as cv
 
 from .api import BticinoX8000Api
@@ -25,6 +29,87 @@ from .const import (
 
 _LOGGER = logging.getLogger(__name__)
 
+_AUTHORIZE_MESSAGE = (
+    "Click the link below to authorize Bticino X8000. "
+    "After authorization, paste the browser URL here."
+)
+
+_AUTH_CODE_SCHEMA = vol.Schema(
+    {
+        vol.Required(
+            "browser_url",
+            description="Paste here the browser URL",
+            default="Paste here the browser URL",
+        ): str,
+    }
+)
+
+
+@dataclass(slots=True)
+class _Thermostat:
+    """Thermostat discovered during the config flow."""
+
+    plant_id: str
+    id: str
+    name: str
+    webhook_id: str
+    programs: list[dict[str, Any]] | None
+
+
+def _extract_code_state(url: str) -> tuple[str, str]:
+    """Extract the code and state query parameters from the browser URL."""
+    code = state = ""
+    url = url.strip()
+    for char in "\t\r\n":
+        url = url.replace(char, "")
+    query = url.partition("?")[2].partition("#")[0]
+    for param in query.split("&"):
+        if not code and param.startswith("code="):
+            code = unquote_plus(param[5:])
+        elif not state and param.startswith("state="):
+            state = unquote_plus(param[6:])
+    if not code or not state:
+        raise ValueError(
+            "Unable to identify the Authorize Code or State. "
+            "Please make sure to provide a valid URL."
+        )
+    return code, state
+
+
+@functools.lru_cache(maxsize=32)
+def _multi_select_for(options: frozenset[tuple[str, str]]) -> cv.multi_select:
+    """Build the thermostat multi-select once per set of id/name choices."""
+    return cv.multi_select(dict(sorted(options, key=lambda option: option[1])))
+
+
+@functools.lru_cache(maxsize=1)
+def _user_schema(external_url: str) -> vol.Schema:
+    """Build the user step schema once per external_url default."""
+    return vol.Schema(
+        {
+            vol.Required(
+                "client_id",
+                description="Client ID",
+                default=CLIENT_ID,
+            ): str,
+            vol.Required(
+                "client_secret",
+                description="Client Secret",
+                default=CLIENT_SECRET,
+            ): str,
+            vol.Required(
+                "subscription_key",
+                description="Subscription Key",
+                default=SUBSCRIPTION_KEY,
+            ): str,
+            vol.Required(
+                "external_url",
+                description="HA external_url",
+                default=external_url,
+            ): str,
+        }
+    )
+
 
 class BticinoX8000ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):  # type:ignore
     """Bticino ConfigFlow."""
@@ -32,21 +117,19 @@ class BticinoX8000ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):  # type:
     def __init__(self) -> None:
         """Init."""
         self.data: dict[str, Any] = {}
-        self._thermostat_options: dict[str, Any] = {}
+        self._thermostat_options: dict[str, _Thermostat] = {}
         self.bticino_api: BticinoX8000Api | None = None
+        self._program_cache: dict[tuple[str, str], list[dict[str, Any]]] = {}
 
     async def async_step_user(
         self, user_input: dict[str, Any] | None = None
     ) -> FlowResult:
         """User configuration."""
-        if self.hass.config.external_url is not None:
-            external_url = self.hass.config.external_url
-        else:
-            external_url = (
-                "My HA external url ex: "
-                "https://pippo.duckdns.com:8123 "
-                "(specify the port if is not standard 443)"
-            )
+        external_url = self.hass.config.external_url or (
+            "My HA external url ex: "
+            "https://pippo.duckdns.com:8123 "
+            "(specify the port if is not standard 443)"
+        )
 
         if self._async_current_entries():
             return self.async_abort(reason="single_instance_allowed")
@@ -54,62 +137,30 @@ class BticinoX8000ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):  # type:
         if user_input is None:
             return self.async_show_form(
                 step_id="user",
-                data_schema=vol.Schema(
-                    {
-                        vol.Required(
-                            "client_id",
-                            description="Client ID",
-                            default=CLIENT_ID,
-                        ): str,
-                        vol.Required(
-                            "client_secret",
-                            description="Client Secret",
-                            default=CLIENT_SECRET,
-                        ): str,
-                        vol.Required(
-                            "subscription_key",
-                            description="Subscription Key",
-                            default=SUBSCRIPTION_KEY,
-                        ): str,
-                        vol.Required(
-                            "external_url",
-                            description="HA external_url",
-                            default=external_url,
-                        ): str,
-                    }
-                ),
+                data_schema=_user_schema(external_url),
             )
 
         self.data = user_input
-        authorization_url = self.get_authorization_url(user_input)
-        message = (
-            f"Click the link below to authorize Bticino X8000. "
-            f"After authorization, paste the browser URL here.\n\n"
-            f"{authorization_url}"
-        )
+        return self._show_authorize_code_form(_AUTHORIZE_MESSAGE)
+
+    def _show_authorize_code_form(self, message: str) -> FlowResult:
+        """Show the browser URL form with the message and authorization link."""
         return self.async_show_form(
             step_id="get_authorize_code",
-            data_schema=vol.Schema(
-                {
-                    vol.Required(
-                        "browser_url",
-                        description="Paste here the browser URL",
-                        default="Paste here the browser URL",
-                    ): str,
-                }
-            ),
-            errors={"base": message},
+            data_schema=_AUTH_CODE_SCHEMA,
+            errors={"base": f"{message}\n\n{self.get_authorization_url(self.data)}"},
         )
 
     def get_authorization_url(self, user_input: dict[str, Any]) -> str:
         """Compose the auth url."""
-        state = secrets.token_hex(16)
+        state = secrets.token_urlsafe(16)
+        client_id = quote(user_input["client_id"], safe="")
         return (
             f"{DEFAULT_AUTH_BASE_URL}{AUTH_URL_ENDPOINT}?"
-            + f"client_id={user_input['client_id']}"
-            + "&response_type=code"
-            + f"&state={state}"
-            + f"&redirect_uri={DEFAULT_REDIRECT_URI}"
+            f"client_id={client_id}"
+            "&response_type=code"
+            f"&state={state}"
+            f"&redirect_uri={DEFAULT_REDIRECT_URI}"
         )
 
     async def async_step_get_authorize_code(
@@ -118,21 +169,14 @@ class BticinoX8000ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):  # type:
         """Get authorization code."""
         if user_input is not None:
             try:
-                parsed_url = urlparse(user_input["browser_url"])
-                _LOGGER.debug("Parsed URL: %s", parsed_url)
-                query_params = parse_qs(parsed_url.query)
-                _LOGGER.debug("Query Parameters: %s", query_params)
-
-                if (
-                    not query_params.get("code", [""])[0]
-                    or not query_params.get("state", [""])[0]
-                ):
-                    raise ValueError(
-                        "Unable to identify the Authorize Code or State. "
-                        "Please make sure to provide a valid URL."
-                    )
+                code, _ = _extract_code_state(user_input["browser_url"])
+            except ValueError as error:
+                _LOGGER.error(error)
+                return self._show_authorize_code_form(str(error))
 
-                self.data["code"] = query_params.get("code", [""])[0]
+            try:
+                _LOGGER.debug("Authorize Code: %s", code)
+                self.data["code"] = code
 
                 (
                     access_token,
@@ -141,14 +185,16 @@ class BticinoX8000ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):  # type:
                 ) = await exchange_code_for_tokens(
                     self.data["client_id"],
                     self.data["client_secret"],
-                    query_params.get("code", [""])[0],
+                    code,
                 )
 
                 self.data["access_token"] = access_token
                 self.data["refresh_token"] = refresh_token
                 self.data["access_token_expires_on"] = access_token_expires_on
 
-                self.bticino_api = BticinoX8000Api(self.data)
+                self.bticino_api = BticinoX8000Api(
+                    self.data, aiohttp_client.async_get_clientsession(self.hass)
+                )
 
                 if not await self.bticino_api.check_api_endpoint_health():
                     return self.async_abort(reason="Auth Failed!")
@@ -157,59 +203,63 @@ class BticinoX8000ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):  # type:
                 plants_data = await self.bticino_api.get_plants()
                 _LOGGER.info("PLANTS_DATA: %s", plants_data)
                 if plants_data["status_code"] == 200:
-                    thermostat_options: dict[Any, Any] = {}
-                    plant_ids = list({plant["id"] for plant in plants_data["data"]})
+                    thermostat_options: dict[str, _Thermostat] = {}
+                    plant_ids = {plant["id"] for plant in plants_data["data"]}
                     _LOGGER.info("PLANTS_LIST: %s", plant_ids)
-                    for plant_id in plant_ids:
-                        topologies = await self.bticino_api.get_topology(plant_id)
-                        _LOGGER.info("TOPOLOGIES_LIST: %s", topologies["data"])
-                        if plant_id not in thermostat_options:
-                            thermostat_options[plant_id] = []
-                        for thermo in topologies["data"]:
-                            thermostat_options[plant_id].append(
-                                {
-                                    "id": thermo["id"],
-                                    "name": thermo["name"],
-                                    "programs": await self.get_programs_from_api(
-                                        plant_id, thermo["id"]
-                                    ),
-                                }
-                            )
+                    topologies = await self.bticino_api.get_topologies(plant_ids)
+                    pairs = []
+                    for plant_id, topology in topologies.items():
+                        _LOGGER.info("TOPOLOGIES_LIST: %s", topology["data"])
+                        pairs.extend((plant_id, thermo) for thermo in topology["data"])
+                    programs_list = await asyncio.gather(
+                        *(
+                            self.get_programs_from_api(plant_id, thermo["id"])
+                            for plant_id, thermo in pairs
+                        )
+                    )
+                    webhook_ids = [generate_id() for _ in pairs]
+                    for (plant_id, thermo), programs, webhook_id in zip(
+                        pairs, programs_list, webhook_ids
+                    ):
+                        thermostat_options[thermo["id"]] = _Thermostat(
+                            plant_id=plant_id,
+                            id=thermo["id"],
+                            name=thermo["name"],
+                            webhook_id=webhook_id,
+                            programs=programs,
+                        )
                     self._thermostat_options = thermostat_options
                     _LOGGER.info("THERMOSTAT_DETECTED: %s", self._thermostat_options)
 
+                names = {
+                    thermo_id: thermo.name
+                    for thermo_id, thermo in self._thermostat_options.items()
+                }
+                select_thermostats_schema = vol.Schema(
+                    {
+                        vol.Required(
+                            "selected_thermostats",
+                            description="Select Thermostats",
+                            default=list(names),
+                        ): _multi_select_for(frozenset(names.items())),
+                    }
+                )
                 return self.async_show_form(
                     step_id="select_thermostats",
-                    data_schema=vol.Schema(
-                        {
-                            vol.Required(
-                                "selected_thermostats",
-                                description="Select Thermostats",
-                                default=[
-                                    options["name"]
-                                    for options_list in self._thermostat_options.values()
-                                    for options in options_list
-                                ],
-                            ): cv.multi_select(
-                                [
-                                    options["name"]
-                                    for options_list in self._thermostat_options.values()
-                                    for options in options_list
-                                ]
-                            ),
-                        }
-                    ),
+                    data_schema=select_thermostats_schema,
                 )
 
             except ValueError as error:
                 _LOGGER.error(error)
-                return await self.async_step_get_authorize_code()
+                return self._show_authorize_code_form(_AUTHORIZE_MESSAGE)
         return await self.async_step_user(self.data)
 
     async def get_programs_from_api(
         self, plant_id: str, topology_id: str
     ) -> list[dict[str, Any]] | None:
         """Retrieve the program list."""
+        if (plant_id, topology_id) in self._program_cache:
+            return self._program_cache[(plant_id, topology_id)]
         if self.bticino_api is not None:
             programs = await self.bticino_api.get_chronothermostat_programlist(
                 plant_id, topology_id
@@ -217,7 +267,7 @@ class BticinoX8000ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):  # type:
             filtered_programs = [
                 program for program in programs["data"] if program["number"] != 0
             ]
-
+            self._program_cache[(plant_id, topology_id)] = filtered_programs
             return filtered_programs
         return None
 
@@ -225,23 +275,23 @@ class BticinoX8000ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):  # type:
         self, user_input: dict[str, Any]
     ) -> FlowResult:
         """User can select one o more thermostat to add."""
+        thermostats = [
+            self._thermostat_options[thermo_id]
+            for thermo_id in user_input["selected_thermostats"]
+        ]
+        # The plant id is the outer key, so it is not repeated in the record
         selected_thermostats = [
-            {thermo_id: {**thermo_data, "webhook_id": generate_id()}}
-            for thermo_id, thermo_list in self._thermostat_options.items()
-            for thermo_data in thermo_list
-            if thermo_data["name"] in user_input["selected_thermostats"]
+            {
+                thermostat.plant_id: {
+                    key: value
+                    for key, value in asdict(thermostat).items()
+                    if key != "plant_id"
+                }
+            }
+            for thermostat in thermostats
         ]
         _LOGGER.info("My_selected_thermostats: %s", selected_thermostats)
-        return self.async_create_entry(
-            title="Bticino X8000",
-            data={
-                "client_id": self.data["client_id"],
-                "client_secret": self.data["client_secret"],
-                "subscription_key": self.data["subscription_key"],
-                "external_url": self.data["external_url"],
-                "access_token": self.data["access_token"],
-                "refresh_token": self.data["refresh_token"],
-                "access_token_expires_on": self.data["access_token_expires_on"],
-                "selected_thermostats": selected_thermostats,
-            },
-        )
+        self._program_cache.clear()
+        payload = {key: value for key, value in self.data.items() if key != "code"}
+        payload["selected_thermostats"] = selected_thermostats
+        return self.async_create_entry(title="Bticino X8000", data=payload)
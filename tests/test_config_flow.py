@@ -0,0 +1,115 @@
+"""Test bticino X8000 config flow helpers."""
+
+import pytest
+
+from custom_components.bticino_x8000.config_flow import (
+    BticinoX8000ConfigFlow,
+    _extract_code_state,
+    _multi_select_for,
+    _Thermostat,
+)
+from custom_components.bticino_x8000.const import DOMAIN
+
+
+def test_extract_code_state():
+    """Test code and state are extracted and decoded."""
+    assert _extract_code_state(
+        "https://my.home-assistant.io/?code=ab%2Fc+d&state=x%3Dy"
+    ) == ("ab/c d", "x=y")
+
+
+def test_extract_code_state_ignores_fragment():
+    """Test the URL fragment is not part of the last parameter."""
+    assert _extract_code_state(
+        "https://my.home-assistant.io/?state=xyz&code=abc#code=other"
+    ) == ("abc", "xyz")
+
+
+def test_extract_code_state_strips_pasted_whitespace():
+    """Test surrounding whitespace and embedded newlines/tabs are dropped."""
+    assert _extract_code_state(
+        "  https://my.home-assistant.io/?code=ab\tc&state=xyz\r\n"
+    ) == ("abc", "xyz")
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "https://my.home-assistant.io/?code=&state=xyz",
+        "https://my.home-assistant.io/?code=abc",
+        "https://my.home-assistant.io/#code=abc&state=xyz",
+        "Paste here the browser URL",
+    ],
+)
+def test_extract_code_state_invalid(url):
+    """Test a ValueError is raised when code or state is missing."""
+    with pytest.raises(ValueError):
+        _extract_code_state(url)
+
+
+def _flow_with_same_named_thermostats() -> BticinoX8000ConfigFlow:
+    """Return a flow that discovered two thermostats named alike."""
+    flow = BticinoX8000ConfigFlow()
+    flow.handler = DOMAIN
+    flow.flow_id = "test_flow"
+    flow.context = {"source": "user"}
+    flow.data = {
+        "client_id": "client_id",
+        "client_secret": "client_secret",
+        "subscription_key": "subscription_key",
+        "external_url": "https://example.com",
+        "code": "code",
+        "access_token": "Bearer token",
+        "refresh_token": "refresh_token",
+        "access_token_expires_on": "2024-01-01T00:00:00+00:00",
+    }
+    flow._thermostat_options = {
+        "thermo_1": _Thermostat(
+            plant_id="plant_1",
+            id="thermo_1",
+            name="Living",
+            webhook_id="webhook_1",
+            programs=[{"number": 1, "name": "Winter"}],
+        ),
+        "thermo_2": _Thermostat(
+            plant_id="plant_2",
+            id="thermo_2",
+            name="Living",
+            webhook_id="webhook_2",
+            programs=[{"number": 2, "name": "Summer"}],
+        ),
+    }
+    return flow
+
+
+def test_multi_select_offers_thermostat_ids():
+    """Test thermostats sharing a name stay separate choices."""
+    validator = _multi_select_for(
+        frozenset({("thermo_1", "Living"), ("thermo_2", "Living")})
+    )
+    assert validator.options == {"thermo_1": "Living", "thermo_2": "Living"}
+    assert validator(["thermo_2"]) == ["thermo_2"]
+
+
+@pytest.mark.asyncio
+async def test_select_thermostats_by_id():
+    """Test only the selected thermostat is stored, keyed by its plant."""
+    flow = _flow_with_same_named_thermostats()
+
+    result = await flow.async_step_select_thermostats(
+        {"selected_thermostats": ["thermo_2"]}
+    )
+
+    assert result["type"] == "create_entry"
+    assert "code" not in result["data"]
+    assert result["data"]["access_token"] == "Bearer token"
+    assert result["data"]["selected_thermostats"] == [
+        {
+            "plant_2": {
+                "id": "thermo_2",
+                "name": "Living",
+                "webhook_id": "webhook_2",
+                "programs": [{"number": 2, "name": "Summer"}],
+            }
+        }
+    ]